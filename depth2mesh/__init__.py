@@ -1,4 +1,9 @@
-from .core import depth2mesh
+from .core import depth2mesh, depth2mesh_from_array
 from .nodes import NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS
 
-__all__ = ["NODE_CLASS_MAPPINGS", "NODE_DISPLAY_NAME_MAPPINGS", "depth2mesh"]
+__all__ = [
+    "NODE_CLASS_MAPPINGS",
+    "NODE_DISPLAY_NAME_MAPPINGS",
+    "depth2mesh",
+    "depth2mesh_from_array",
+]
@@ -29,8 +29,6 @@ def depth2mesh(image_input, mesh_width_mm, mesh_height_mm, mesh_depth_mm, power=
     else:
         image = image_input.convert("RGBA")
 
-    width_px, height_px = image.size
-
     # Step 2: Create a mask based on the alpha channel
     # The alpha channel determines the "active" area of the mesh.
     # Pixels with alpha=0 are ignored and will not generate vertices.
@@ -38,16 +36,49 @@ def depth2mesh(image_input, mesh_width_mm, mesh_height_mm, mesh_depth_mm, power=
     alpha = data[:, :, 3]
     mask = alpha != 0  # True for opaque pixels
 
-    if not mask.any():
-        raise ValueError("All pixels are transparent. No mesh to generate.")
-
     # Step 3: Compute the height map from the RGB channels (average for simplicity)
     # Convert RGB to grayscale intensity to represent height.
     rgb = data[:, :, :3]
     height_map = rgb.mean(axis=2).astype(np.float32)
 
-    # Apply mask: set height to 0 where mask is False (outside the shape)
-    height_map[~mask] = 0.0
+    return depth2mesh_from_array(
+        height_map, mesh_width_mm, mesh_height_mm, mesh_depth_mm, power, mask=mask
+    )
+
+
+def depth2mesh_from_array(
+    height_map, mesh_width_mm, mesh_height_mm, mesh_depth_mm, power=1.0, mask=None
+):
+    """
+    Converts a 2D height map array to a closed mesh suitable for CNC milling.
+
+    Masked-out pixels are ignored. All walls and bottom are closed.
+
+    Parameters:
+    - height_map: 2D float array [H, W] of non-negative heights. Any scale works
+                  (e.g. 0-1 or 0-255), values are normalized to the maximum.
+    - mesh_width_mm: Desired width of the mesh in millimeters (x-axis).
+    - mesh_height_mm: Desired height of the mesh in millimeters (y-axis).
+    - mesh_depth_mm: Desired maximum depth of the mesh in millimeters (z-axis).
+    - power: Optional power transformation to apply to the depth values to make the z-axis more prominent.
+             Default is 1.0 (no transformation).
+    - mask: Optional 2D boolean array [H, W]. Pixels where it is False are ignored.
+            Default is None (all pixels are used).
+
+    Returns:
+    - A trimesh.Trimesh object representing the closed mesh.
+    """
+    height_px, width_px = height_map.shape
+    if mask is None:
+        mask = np.ones(height_map.shape, dtype=bool)
+
+    if not mask.any():
+        raise ValueError("All pixels are transparent. No mesh to generate.")
+
+    # Apply mask: set height to 0 where mask is False (outside the shape).
+    # Negative heights are clamped to 0 so the top never dips below the base
+    # (and the power curve below never sees negative values).
+    height_map = np.where(mask, np.maximum(height_map, 0.0), 0.0).astype(np.float32)
 
     # Normalize the height map to range [0, 1]
     # This prepares the data for scaling by 'mesh_depth_mm' later.
@@ -1,7 +1,35 @@
+import functools
+import weakref
+
 import numpy as np
-from PIL import Image
+import trimesh
+
+from .core import depth2mesh_from_array
+
+# Preview image size in pixels (square)
+PREVIEW_RESOLUTION = 1024
+
+# Binary STL facet record: normal, three corners, attribute byte count
+BINARY_STL_DTYPE = np.dtype(
+    [("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attributes", "<u2")]
+)
+
+# Below this target/current face ratio, the preview decimates with vertex
+# clustering instead of quadric decimation.
+CLUSTERING_RATIO = 0.1
+
+# Isometric preview camera angles in degrees (Matplotlib's default 3D view)
+PREVIEW_ELEVATION = 30.0
+PREVIEW_AZIMUTH = -60.0
 
-from .core import depth2mesh
+# Unit vector pointing from the mesh towards the preview camera
+PREVIEW_VIEW_DIR = np.array(
+    [
+        np.cos(np.radians(PREVIEW_ELEVATION)) * np.cos(np.radians(PREVIEW_AZIMUTH)),
+        np.cos(np.radians(PREVIEW_ELEVATION)) * np.sin(np.radians(PREVIEW_AZIMUTH)),
+        np.sin(np.radians(PREVIEW_ELEVATION)),
+    ]
+)
 
 
 class DepthMapToMesh:
@@ -59,19 +87,38 @@ class DepthMapToMesh:
         }
 
     RETURN_TYPES = ("MESH",)
+    OUTPUT_IS_LIST = (True,)  # One mesh per image in the input batch
     FUNCTION = "generate"
     CATEGORY = "depth2mesh"
 
     def generate(self, image, width_mm, height_mm, depth_mm, power):
         # ComfyUI provides images as [Batch, Height, Width, Channels] tensors in range 0-1.
-        # We need to convert the first image in the batch to a PIL Image (0-255 uint8)
-        # for our core processing logic.
-        img_np = image[0].cpu().numpy()
-        img_pil = Image.fromarray(np.clip(img_np * 255.0, 0, 255).astype(np.uint8))
+        # Every image in the batch is converted independently into its own mesh.
+        meshes = [
+            self._image_to_mesh(image[i], width_mm, height_mm, depth_mm, power)
+            for i in range(image.shape[0])
+        ]
+
+        # Output is a list (see OUTPUT_IS_LIST), so downstream nodes run once per mesh
+        return (meshes,)
+
+    def _image_to_mesh(self, image, width_mm, height_mm, depth_mm, power):
+        # The core only needs a float height map, so we derive it from the tensor
+        # directly instead of round-tripping through a uint8 PIL Image.
+        img_np = image.cpu().numpy()
+
+        # Grayscale as the plain RGB average (same as the PIL path) in one matmul
+        height_map = img_np[..., :3] @ np.full(3, 1.0 / 3.0, dtype=np.float32)
+        # Out-of-range pixels are clipped to 0-1, as the uint8 conversion used to do
+        np.clip(height_map, 0.0, 1.0, out=height_map)
+
+        # Optional alpha channel cuts the mesh, like in the PIL path
+        mask = img_np[..., 3] != 0 if img_np.shape[-1] == 4 else None
 
         # Call the core conversion logic
-        mesh = depth2mesh(img_pil, width_mm, height_mm, depth_mm, power)
-        return (mesh,)
+        return depth2mesh_from_array(
+            height_map, width_mm, height_mm, depth_mm, power, mask=mask
+        )
 
 
 class SimplifyMesh:
@@ -96,23 +143,45 @@ class SimplifyMesh:
                     },
                 ),
             },
+            "optional": {
+                "min_reduction": (
+                    "FLOAT",
+                    {
+                        "default": 0.05,
+                        "min": 0.0,
+                        "max": 1.0,
+                        "step": 0.01,
+                        "tooltip": "Skip simplification unless it removes at least this fraction of faces.",
+                    },
+                ),
+            },
         }
 
     RETURN_TYPES = ("MESH",)
     FUNCTION = "simplify"
     CATEGORY = "depth2mesh"
 
-    def simplify(self, mesh, target_face_count):
-        # We use trimesh's simplify_quadric_decimation.
-        # Note: 'fast-simplification' python package is highly recommended for performance here.
-        # If not installed, trimesh falls back to other methods or raises errors depending on setup.
+    # Simplified meshes keyed by (input mesh hash, target face count).
+    # Entries live only as long as something else still holds the result.
+    _cache = weakref.WeakValueDictionary()
 
-        # Optimization: Do nothing if the mesh is already small enough
-        if len(mesh.faces) <= target_face_count:
+    def simplify(self, mesh, target_face_count, min_reduction=0.05):
+        # Optimization: Do nothing if the mesh is already small enough,
+        # or if decimation would only shave off a few faces at full cost
+        if target_face_count >= (1.0 - min_reduction) * len(mesh.faces):
             return (mesh,)
 
+        # Optimization: Reuse the result for identical geometry and settings.
+        # trimesh hashes the vertex/face data (cached until it changes),
+        # so a modified mesh never hits a stale entry.
+        key = (hash(mesh), target_face_count)
+        simplified_mesh = self._cache.get(key)
+        if simplified_mesh is not None:
+            return (simplified_mesh,)
+
         # Perform decimation
-        simplified_mesh = mesh.simplify_quadric_decimation(face_count=target_face_count)
+        simplified_mesh = _decimate(mesh, target_face_count)
+        self._cache[key] = simplified_mesh
         return (simplified_mesh,)
 
 
@@ -142,6 +211,10 @@ class SaveMeshSTL:
     OUTPUT_NODE = True  # Tells ComfyUI that this node has side effects (saving files)
     CATEGORY = "depth2mesh"
 
+    # Next free counter per (output_dir, filename_prefix), so the output
+    # directory only has to be scanned once per prefix.
+    _counter_cache = {}
+
     def save(self, mesh, filename_prefix):
         # Locate ComfyUI's output folder
         import os
@@ -150,17 +223,22 @@ class SaveMeshSTL:
 
         output_dir = folder_paths.get_output_directory()
 
-        # Find the next available filename to avoid overwrites
-        counter = 1
-        while True:
-            filename = f"{filename_prefix}{counter:05d}.stl"
-            filepath = os.path.join(output_dir, filename)
-            if not os.path.exists(filepath):
-                break
-            counter += 1
+        # Find the next available filename to avoid overwrites.
+        # A locked counter file makes this O(1) and safe across processes.
+        counter = _claim_sidecar_counter(output_dir, filename_prefix)
+        if counter is None:
+            # No file locking on this platform (e.g. Windows): scan once, then cache
+            key = (output_dir, filename_prefix)
+            counter = self._counter_cache.get(key)
+            if counter is None:
+                counter = _scan_next_counter(output_dir, filename_prefix)
+            counter = _first_free_counter(output_dir, filename_prefix, counter)
+            self._counter_cache[key] = counter + 1
+
+        filepath = os.path.join(output_dir, f"{filename_prefix}{counter:05d}.stl")
 
-        # Export using trimesh
-        mesh.export(filepath)
+        # Export as binary STL, streamed straight to disk
+        _write_binary_stl(mesh, filepath)
 
         # Return UI feedback so the user knows where the file went
         return {"ui": {"status": [f"Saved to {filepath}"]}}
@@ -184,33 +262,172 @@ class PreviewMeshSTL:
     FUNCTION = "preview"
     CATEGORY = "depth2mesh"
 
+    # Offscreen GPU renderer, shared across invocations so the (slow) EGL
+    # context is only created once.
+    _renderer = None
+    # Set once pyrender failed to import or create a context, so later calls
+    # go straight to the Matplotlib fallback.
+    _renderer_unavailable = False
+
+    # Matplotlib figure and 3D axes, reused by the fallback renderer
+    _fig = None
+    _ax = None
+
     def preview(self, mesh):
-        from io import BytesIO
+        # Prefer GPU rasterization when pyrender is installed, otherwise fall
+        # back to the pure-python Matplotlib renderer.
+        img_np = self._render_pyrender(mesh)
+        if img_np is None:
+            img_np = self._render_matplotlib(mesh)
+
+        # Convert to ComfyUI-compatible format
+        # ComfyUI expects float32 [B, H, W, C] tensors in range 0-1
+        img_np = img_np[None, :, :, :]  # Add batch dimension
+
+        # If 'torch' is available, return a Tensor (standard ComfyUI behavior).
+        # If not (e.g., lightweight dev env), return numpy array (some nodes support this).
+        torch = _lazy_torch()
+        if torch is not None:
+            return (torch.from_numpy(img_np),)
+        return (img_np,)
+
+    def _render_pyrender(self, mesh):
+        """
+        Render the mesh with an offscreen OpenGL rasterizer.
+        Returns a float32 [H, W, 3] array, or None if pyrender is unavailable.
+        """
+        import os
+        import sys
+
+        cls = type(self)
+        if cls._renderer_unavailable:
+            return None
+
+        if cls._renderer is None:
+            # Headless Linux servers have no display; render through EGL instead.
+            # Other platforms have no EGL, so leave their OpenGL setup alone.
+            if sys.platform.startswith("linux") and not os.environ.get("DISPLAY"):
+                os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+            try:
+                # Not only ImportError: PyOpenGL can fail in other ways on import
+                import pyrender
+
+                cls._renderer = pyrender.OffscreenRenderer(
+                    PREVIEW_RESOLUTION, PREVIEW_RESOLUTION
+                )
+            except ImportError:
+                cls._renderer_unavailable = True
+                return None
+            except Exception as e:
+                print(f"[depth2mesh] Offscreen rendering unavailable: {e}")
+                cls._renderer_unavailable = True
+                return None
+
+        import pyrender
+
+        # Upload the full mesh once; the GPU handles millions of faces without decimation.
+        scene = pyrender.Scene(
+            bg_color=[1.0, 1.0, 1.0, 1.0], ambient_light=[0.3, 0.3, 0.3]
+        )
+        # pyrender lights faces by their winding, and depth2mesh winds its meshes
+        # inwards (negative volume): render an outward-wound copy instead.
+        if mesh.is_watertight and mesh.volume < 0:
+            mesh = mesh.copy()
+            mesh.invert()
+        # A matte, non-metallic surface (the defaults are fully metallic, which
+        # renders nearly black without an environment map). Double-sided, so open
+        # meshes are not culled away.
+        material = pyrender.MetallicRoughnessMaterial(
+            baseColorFactor=[0.8, 0.8, 0.8, 1.0],
+            metallicFactor=0.0,
+            roughnessFactor=0.8,
+            doubleSided=True,
+        )
+        scene.add(pyrender.Mesh.from_trimesh(mesh, material=material, smooth=False))
+
+        # Place the camera on the same isometric view direction as the Matplotlib preview
+        # and pull it back far enough to frame the whole bounding box.
+        bounds = np.asarray(mesh.bounds, dtype=np.float64)
+        center = bounds.mean(axis=0)
+        radius = max(np.linalg.norm(bounds[1] - bounds[0]) / 2.0, 1e-6)
+        yfov = np.pi / 4.0
+        eye = center + PREVIEW_VIEW_DIR * radius / np.sin(yfov / 2.0)
+        pose = _look_at(eye, center)
 
-        import matplotlib.pyplot as plt
+        scene.add(pyrender.PerspectiveCamera(yfov=yfov), pose=pose)
+        scene.add(pyrender.DirectionalLight(color=np.ones(3), intensity=3.0), pose=pose)
+
+        color, _ = cls._renderer.render(scene)
+        return color.astype(np.float32) / 255.0
+
+    def _render_matplotlib(self, mesh):
+        """
+        Render the mesh with Matplotlib's pure-python 3D plotting.
+        Returns a float32 [H, W, 3] array.
+        """
+        from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+
+        plt = _lazy_pyplot()
 
         # Optimization: Simplify the mesh significantly for the preview only.
         # Matplotlib handles ~50k faces reasonably well; 2M+ will hang.
         PREVIEW_FACE_LIMIT = 50000
         render_mesh = mesh
         if len(mesh.faces) > PREVIEW_FACE_LIMIT:
-            render_mesh = mesh.simplify_quadric_decimation(
-                face_count=PREVIEW_FACE_LIMIT
-            )
+            # When most faces will be collapsed anyway, computing quadrics is wasted
+            # work. Clustering is not watertight, which is fine for a thumbnail.
+            if PREVIEW_FACE_LIMIT < CLUSTERING_RATIO * len(mesh.faces):
+                render_mesh = _cluster_vertices(mesh, PREVIEW_FACE_LIMIT)
+            else:
+                render_mesh = _decimate(mesh, PREVIEW_FACE_LIMIT)
 
         # Setup pure-python rendering using Matplotlib
         # This avoids needing a heavy 3D engine just for a preview thumbnail.
-        fig = plt.figure(figsize=(10, 10))
-        ax = fig.add_subplot(111, projection="3d")
-
-        # Extract geometry
-        v = render_mesh.vertices
-        f = render_mesh.faces
-
-        # Plot mesh surfaces
-        ax.plot_trisurf(
-            v[:, 0], v[:, 1], v[:, 2], triangles=f, cmap="viridis", edgecolor="none"
+        # The figure and 3D axes are reused across calls, since building them is costly.
+        cls = type(self)
+        if cls._fig is None:
+            cls._fig = plt.figure(figsize=(10, 10))
+            # Let the axes fill the canvas, as there is no tight bbox crop when reading it
+            cls._fig.subplots_adjust(left=0, right=1, bottom=0, top=1)
+            cls._ax = cls._fig.add_subplot(111, projection="3d")
+        else:
+            cls._ax.clear()
+        fig, ax = cls._fig, cls._ax
+        ax.view_init(elev=PREVIEW_ELEVATION, azim=PREVIEW_AZIMUTH)
+
+        # Extract geometry as render-only float32/int32 copies, halving the memory
+        # traffic of the per-face gathers below. The input mesh is left untouched.
+        v = np.ascontiguousarray(render_mesh.vertices, dtype=np.float32)
+        f = np.ascontiguousarray(render_mesh.faces, dtype=np.int32)
+
+        # Plot mesh surfaces as a single collection built from one (F, 3, 3) array.
+        # plot_trisurf builds per-face Python objects, which is far slower.
+        tris, z_mean, normals = _face_attributes(v, f)
+        z_range = np.ptp(z_mean)
+        z_min = z_mean.min()
+
+        # Matplotlib has no depth culling, so drop faces pointing away from the
+        # camera (and degenerate faces, whose normal is zero) before drawing.
+        # Take the orientation from the input mesh, since simplification keeps its
+        # winding but the clustered mesh is no longer watertight: flip the normals
+        # when the input is wound inwards (negative volume).
+        orientation = np.sign(mesh.volume) if mesh.is_watertight else 0.0
+        facing = normals @ PREVIEW_VIEW_DIR * (orientation or 1.0)
+        visible = facing > 0
+        tris, z_mean, facing = tris[visible], z_mean[visible], facing[visible]
+
+        z_norm = (z_mean - z_min) / z_range if z_range > 0 else z_mean * 0.0
+        colors = plt.get_cmap("viridis")(z_norm)
+
+        # Simple Lambert shading with the light at the camera, so relief is readable
+        colors[:, :3] *= 0.4 + 0.6 * facing[:, None]
+        ax.add_collection3d(
+            # Antialiasing would show the white background through seams between faces
+            Poly3DCollection(
+                tris, facecolors=colors, edgecolors="none", antialiased=False
+            )
         )
+        ax.auto_scale_xyz(v[:, 0], v[:, 1], v[:, 2])
 
         # Force equal aspect ratio for correct visualization dimensions
         # Handle cases where the mesh is flat (e.g. ptp=0) by replacing 0 with a small epsilon
@@ -220,30 +437,276 @@ class PreviewMeshSTL:
         ax.set_box_aspect(aspect)
 
         # Hide chart axes
-        plt.axis("off")
+        ax.set_axis_off()
+
+        # Render the plot and read the RGBA canvas directly, skipping PNG encode/decode
+        fig.canvas.draw()
+        rgba = np.asarray(fig.canvas.buffer_rgba())
+        return rgba[:, :, :3].astype(np.float32) * (1.0 / 255.0)
+
+
+@functools.cache
+def _lazy_torch():
+    """
+    Import torch on first use and memoize it (None if it is not installed).
+    """
+    try:
+        import torch
+    except ImportError:
+        return None
+    return torch
+
+
+@functools.cache
+def _lazy_pyplot():
+    """
+    Import matplotlib.pyplot (~300ms) on first use and memoize it.
+    """
+    import matplotlib.pyplot as plt
+
+    return plt
 
-        # Render the plot to an in-memory buffer
-        buf = BytesIO()
-        plt.savefig(
-            buf, format="png", bbox_inches="tight", pad_inches=0, transparent=True
+
+def _decimate(mesh, target_face_count):
+    """
+    Reduce a mesh to roughly 'target_face_count' faces with quadric decimation.
+
+    Calls the C++ simplifiers directly, in order of preference:
+    fast-simplification, then meshoptimizer, then whatever trimesh can find.
+    """
+    try:
+        import fast_simplification
+    except ImportError:
+        fast_simplification = None
+
+    if fast_simplification is not None:
+        # float64 vertices and int64 faces are accepted as-is, so no copies are made
+        vertices, faces = fast_simplification.simplify(
+            np.asarray(mesh.vertices, dtype=np.float64),
+            np.asarray(mesh.faces),
+            target_count=target_face_count,
+        )
+        # The decimated output is already clean; skip trimesh's merge/validate pass
+        return trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+
+    try:
+        import meshoptimizer
+    except ImportError:
+        meshoptimizer = None
+
+    if meshoptimizer is not None:
+        indices = np.ascontiguousarray(mesh.faces, dtype=np.uint32).reshape(-1)
+        destination = np.zeros_like(indices)
+        index_count = meshoptimizer.simplify(
+            destination,
+            indices,
+            np.ascontiguousarray(mesh.vertices, dtype=np.float32),
+            target_index_count=3 * target_face_count,
+            target_error=1e-2,
         )
-        buf.seek(0)
-        img_pil = Image.open(buf).convert("RGB")
-        plt.close(fig)
+        simplified_mesh = trimesh.Trimesh(
+            vertices=mesh.vertices,
+            faces=destination[:index_count].reshape(-1, 3),
+            process=False,
+        )
+        # meshoptimizer only rewrites indices; drop the vertices no longer used
+        simplified_mesh.remove_unreferenced_vertices()
+        return simplified_mesh
 
-        # Convert PIL image to ComfyUI-compatible format
-        # ComfyUI expects float32 [B, H, W, C] tensors in range 0-1
-        img_np = np.array(img_pil).astype(np.float32) / 255.0
-        img_np = img_np[None, :, :, :]  # Add batch dimension
+    # Last resort: let trimesh pick whichever backend it can find
+    return mesh.simplify_quadric_decimation(face_count=target_face_count)
 
-        # If 'torch' is available, return a Tensor (standard ComfyUI behavior).
-        # If not (e.g., lightweight dev env), return numpy array (some nodes support this).
-        try:
-            import torch
 
-            return (torch.from_numpy(img_np),)
-        except ImportError:
-            return (img_np,)
+def _cluster_vertices(mesh, target_face_count):
+    """
+    Approximate decimation of a relief mesh by snapping vertices to an x/y grid.
+
+    Vertices sharing a grid column are merged into their centroid, with base
+    vertices (lowest z) kept in their own bucket so thin reliefs are not merged
+    into the base. The triangles that collapse are dropped. Runs in near-linear
+    time, but the result is not watertight, so it is only used for previews.
+    """
+    vertices = np.asarray(mesh.vertices, dtype=np.float64)
+    faces = np.asarray(mesh.faces)
+
+    # Size cells so that the top and the base each keep about two triangles per cell
+    footprint = np.prod(np.ptp(vertices[:, :2], axis=0))
+    cell_size = np.sqrt(4.0 * footprint / target_face_count)
+    if not cell_size > 0:
+        return mesh
+
+    columns = np.floor((vertices[:, :2] - vertices[:, :2].min(axis=0)) / cell_size)
+    is_base = vertices[:, 2] <= vertices[:, 2].min()
+    cells = np.column_stack([columns.astype(np.int64), is_base])
+
+    # Assign every vertex a single integer cell id
+    cell_ids = np.ravel_multi_index(cells.T, cells.max(axis=0) + 1)
+    _, inverse, counts = np.unique(cell_ids, return_inverse=True, return_counts=True)
+
+    # Each cluster is represented by the centroid of its vertices
+    clustered_vertices = np.column_stack(
+        [np.bincount(inverse, weights=vertices[:, i]) for i in range(3)]
+    )
+    clustered_vertices /= counts[:, None]
+
+    # Remap faces and drop those whose corners fell into the same cell
+    clustered_faces = inverse[faces]
+    nondegenerate = (
+        (clustered_faces[:, 0] != clustered_faces[:, 1])
+        & (clustered_faces[:, 1] != clustered_faces[:, 2])
+        & (clustered_faces[:, 2] != clustered_faces[:, 0])
+    )
+
+    simplified_mesh = trimesh.Trimesh(
+        vertices=clustered_vertices,
+        faces=clustered_faces[nondegenerate],
+        process=False,
+    )
+    simplified_mesh.update_faces(simplified_mesh.unique_faces())
+    simplified_mesh.remove_unreferenced_vertices()
+    return simplified_mesh
+
+
+def _claim_sidecar_counter(output_dir, filename_prefix):
+    """
+    Read and advance the counter stored in a hidden '.<prefix>.ctr' file.
+    The file is locked while it is updated, so concurrent saves never share a counter.
+    Returns None if file locking is unavailable or the counter file cannot be used.
+    """
+    import os
+
+    try:
+        import fcntl
+    except ImportError:
+        return None
+
+    prefix_dir, prefix_name = os.path.split(filename_prefix)
+    counter_path = os.path.join(output_dir, prefix_dir, f".{prefix_name}.ctr")
+    try:
+        fd = os.open(counter_path, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, "r+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            content = f.read().strip()
+            if content.isdigit():
+                counter = int(content)
+            else:
+                # New (or corrupt) counter file: start after any existing files
+                counter = _scan_next_counter(output_dir, filename_prefix)
+
+            # The counter is stale if files were saved by other means; skip past them
+            counter = _first_free_counter(output_dir, filename_prefix, counter)
+
+            f.seek(0)
+            f.write(str(counter + 1))
+            f.truncate()
+    except OSError as e:
+        print(f"[depth2mesh] Could not use counter file {counter_path}: {e}")
+        return None
+    return counter
+
+
+def _scan_next_counter(output_dir, filename_prefix):
+    """
+    Return the counter following the highest '<prefix>NNNNN.stl' in output_dir.
+    Uses a single directory listing instead of one stat call per candidate.
+    """
+    import os
+    import re
+
+    # The prefix may contain a subfolder (e.g. 'meshes/relief_')
+    prefix_dir, prefix_name = os.path.split(filename_prefix)
+    pattern = re.compile(rf"{re.escape(prefix_name)}(\d{{5}})\.stl$")
+    try:
+        with os.scandir(os.path.join(output_dir, prefix_dir)) as entries:
+            counters = [
+                int(m.group(1)) for entry in entries if (m := pattern.match(entry.name))
+            ]
+    except FileNotFoundError:
+        counters = []
+    return max(counters, default=0) + 1
+
+
+def _first_free_counter(output_dir, filename_prefix, counter):
+    """
+    Return the first counter, starting at 'counter', whose file does not exist yet.
+    Costs one stat call in the common case, and at most one directory listing
+    (with in-memory lookups) when the starting counter is already taken.
+    """
+    import os
+
+    if not os.path.exists(
+        os.path.join(output_dir, f"{filename_prefix}{counter:05d}.stl")
+    ):
+        return counter
+
+    prefix_dir, prefix_name = os.path.split(filename_prefix)
+    existing = set(os.listdir(os.path.join(output_dir, prefix_dir)))
+    counter += 1
+    while f"{prefix_name}{counter:05d}.stl" in existing:
+        counter += 1
+    return counter
+
+
+def _write_binary_stl(mesh, filepath):
+    """
+    Write a mesh as binary STL.
+    Packs all facets into one structured array and streams it to disk,
+    avoiding the intermediate bytes copy made by a generic exporter.
+    """
+    vertices = np.asarray(mesh.vertices)
+    faces = np.asarray(mesh.faces)
+
+    records = np.zeros(len(faces), dtype=BINARY_STL_DTYPE)
+    records["vertices"] = vertices[faces]
+
+    # Facet normals from the packed (float32) corners, so they always match the
+    # written winding (trimesh's cached face_normals may not, e.g. after invert())
+    triangles = records["vertices"]
+    normals = np.cross(
+        triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]
+    )
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    np.divide(normals, lengths, out=normals, where=lengths > 0)
+    records["normal"] = normals
+
+    with open(filepath, "wb", buffering=1 << 20) as f:
+        f.write(bytes(80))  # Header, unused
+        f.write(np.uint32(len(faces)).tobytes())
+        records.tofile(f)
+
+
+def _face_attributes(v, f):
+    """
+    Compute per-face triangles, mean heights and unit normals in one pass.
+    Normals follow the face winding (zero for degenerate faces).
+    Returns (tris [F, 3, 3], z_mean [F], normals [F, 3]).
+    """
+    tris = v[f]
+    z_mean = tris[:, :, 2].mean(axis=1)
+
+    normals = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    np.divide(normals, lengths, out=normals, where=lengths > 0)
+    return tris, z_mean, normals
+
+
+def _look_at(eye, target, up=(0.0, 0.0, 1.0)):
+    """
+    Build a 4x4 camera-to-world pose looking from 'eye' towards 'target'.
+    Follows the OpenGL convention used by pyrender (camera looks down -Z).
+    """
+    forward = eye - target
+    forward = forward / np.linalg.norm(forward)
+    right = np.cross(up, forward)
+    right = right / np.linalg.norm(right)
+    true_up = np.cross(forward, right)
+
+    pose = np.eye(4)
+    pose[:3, 0] = right
+    pose[:3, 1] = true_up
+    pose[:3, 2] = forward
+    pose[:3, 3] = eye
+    return pose
 
 
 NODE_CLASS_MAPPINGS = {
@@ -1,4 +1,5 @@
 import os
+import shutil
 import subprocess
 import sys
 
@@ -19,10 +20,22 @@ def install():
 
     print(f"[depth2mesh] Installing requirements from {req_file}...")
 
-    command = [sys.executable, "-m", "pip", "install", "-r", req_file]
+    args = ["install", "-r", req_file]
+
+    # Prefer uv when available: its resolver and installer are much faster than pip.
+    uv = shutil.which("uv")
+    if uv:
+        command = [uv, "pip"] + args + ["--python", sys.executable]
+    else:
+        command = [sys.executable, "-m", "pip"] + args
 
     try:
-        subprocess.check_call(command)
+        if uv:
+            returncode = subprocess.call(command)
+        else:
+            returncode = _pip_in_process(args)
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, command)
         print("[depth2mesh] Installation successful.")
     except subprocess.CalledProcessError as e:
         print(f"[depth2mesh] Installation failed! Error code: {e.returncode}")
@@ -33,5 +46,22 @@ def install():
         sys.exit(1)
 
 
+def _pip_in_process(args):
+    """
+    Run pip inside the current interpreter, avoiding a second interpreter start-up.
+    pip's internal API is not stable, so fall back to a subprocess if it has moved.
+    """
+    try:
+        from pip._internal.cli.main import main as pip_main
+    except ImportError:
+        return subprocess.call([sys.executable, "-m", "pip"] + args)
+
+    # Some pip code paths (e.g. option errors) exit instead of returning a status
+    try:
+        return pip_main(args)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else int(e.code is not None)
+
+
 if __name__ == "__main__":
     install()
@@ -3,7 +3,7 @@ import pytest
 import trimesh
 from PIL import Image
 
-from depth2mesh.core import depth2mesh
+from depth2mesh.core import depth2mesh, depth2mesh_from_array
 
 
 def create_synthetic_image(width, height, shape="square"):
@@ -145,3 +145,45 @@ def test_depth2mesh_donut_shape():
     assert mesh.is_watertight
     # Should have internal walls now
     assert len(mesh.faces) > 500  # Roughly
+
+
+def test_depth2mesh_from_array_matches_image_path():
+    # Arrange
+    img = create_synthetic_image(10, 10, shape="circle")
+    data = np.array(img)
+    height_map = data[:, :, :3].mean(axis=2) / 255.0
+    mask = data[:, :, 3] != 0
+
+    # Act
+    mesh_from_image = depth2mesh(img, 10.0, 10.0, 5.0)
+    mesh_from_array = depth2mesh_from_array(height_map, 10.0, 10.0, 5.0, mask=mask)
+
+    # Assert
+    assert np.allclose(mesh_from_array.bounds, mesh_from_image.bounds)
+    assert len(mesh_from_array.faces) == len(mesh_from_image.faces)
+    assert mesh_from_array.is_watertight
+
+
+def test_depth2mesh_from_array_without_mask():
+    # Arrange
+    height_map = np.linspace(0.0, 1.0, 25, dtype=np.float32).reshape(5, 5)
+
+    # Act
+    mesh = depth2mesh_from_array(height_map, 10.0, 10.0, 5.0)
+
+    # Assert
+    assert np.allclose(mesh.bounds, [[0.0, 0.0, 0.0], [10.0, 10.0, 5.0]])
+
+
+def test_depth2mesh_from_array_clamps_negative_heights():
+    # Arrange
+    height_map = np.linspace(0.0, 1.0, 100, dtype=np.float32).reshape(10, 10)
+    height_map[4, 4] = -0.01
+
+    # Act
+    mesh = depth2mesh_from_array(height_map, 10.0, 10.0, 5.0, power=2.5)
+
+    # Assert
+    assert np.isfinite(mesh.vertices).all()
+    assert mesh.vertices[:, 2].min() >= 0.0
+    assert mesh.is_watertight
@@ -6,14 +6,21 @@ from unittest.mock import MagicMock, patch
 import matplotlib
 import numpy as np
 import pytest
+import trimesh
 
 matplotlib.use("Agg")
 
+from depth2mesh.core import depth2mesh_from_array  # noqa: E402
 from depth2mesh.nodes import (  # noqa: E402
+    BINARY_STL_DTYPE,
+    PREVIEW_VIEW_DIR,
     DepthMapToMesh,
     PreviewMeshSTL,
     SaveMeshSTL,
     SimplifyMesh,
+    _cluster_vertices,
+    _first_free_counter,
+    _write_binary_stl,
 )
 
 # --- Fixtures and Mocks ---
@@ -58,6 +65,8 @@ def mock_mesh():
     # Basic properties that might be accessed
     mesh.vertices = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
     mesh.faces = np.array([[0, 1, 2]])
+    mesh.face_normals = np.array([[0.0, 0.0, 1.0]])
+    mesh.is_watertight = False
     # Mock simplify method to return itself (or a copy)
     mesh.simplify_quadric_decimation.return_value = mesh
     return mesh
@@ -66,7 +75,7 @@ def mock_mesh():
 # --- Tests ---
 
 
-def test_depth_map_to_mesh_generate(mock_image_tensor):
+def test_depth_map_to_mesh_generate(mock_image_tensor, mock_mesh):
     # Arrange
     node = DepthMapToMesh()
     width = 10.0
@@ -76,37 +85,187 @@ def test_depth_map_to_mesh_generate(mock_image_tensor):
 
     # Act
     # Patch the core function to verify node logic without running expensive geometry
-    with patch("depth2mesh.nodes.depth2mesh") as mock_core_func:
-        mock_core_func.return_value = "MockTRIMESH"
+    with patch("depth2mesh.nodes.depth2mesh_from_array") as mock_core_func:
+        mock_core_func.return_value = mock_mesh
         result = node.generate(mock_image_tensor, width, height, depth, power)
 
     # Assert
-    assert result == ("MockTRIMESH",)
+    assert result == ([mock_mesh],)
     mock_core_func.assert_called_once()
 
-    # Verify the image passed to core was correct
-    args, _ = mock_core_func.call_args
-    img_arg = args[0]
-    # Should be a PIL Image
-    assert hasattr(img_arg, "size")
+    # Verify the height map passed to core was correct
+    args, kwargs = mock_core_func.call_args
+    height_map = args[0]
+    # Should be the float RGB average of the first image, without quantization
+    expected = mock_image_tensor.numpy()[0].mean(axis=2)
+    assert height_map.shape == (10, 10)
+    assert np.allclose(height_map, expected)
+    assert kwargs["mask"] is None
+
+
+def test_depth_map_to_mesh_generate_batch():
+    # Arrange
+    node = DepthMapToMesh()
+    data = np.random.rand(3, 10, 10, 3).astype(np.float32)
+
+    def fake_core(height_map, *args, **kwargs):
+        return MagicMock(height=float(height_map.mean()))
+
+    # Act
+    with patch("depth2mesh.nodes.depth2mesh_from_array", side_effect=fake_core):
+        result = node.generate(MockTensor(data), 10.0, 10.0, 5.0, 1.0)
+
+    # Assert
+    # One mesh per image, in batch order
+    meshes = result[0]
+    assert len(meshes) == 3
+    assert np.allclose([m.height for m in meshes], data.mean(axis=(1, 2, 3)))
+
+
+def test_depth_map_to_mesh_generate_clips_out_of_range_pixels():
+    # Arrange
+    node = DepthMapToMesh()
+    data = np.full((1, 4, 4, 3), 0.5, dtype=np.float32)
+    data[0, 0, 0] = -0.2
+    data[0, 0, 1] = 1.5
+
+    # Act
+    with patch("depth2mesh.nodes.depth2mesh_from_array") as mock_core_func:
+        node.generate(MockTensor(data), 10.0, 10.0, 5.0, 1.0)
+
+    # Assert
+    height_map = mock_core_func.call_args[0][0]
+    assert height_map[0, 0] == 0.0
+    assert height_map[0, 1] == 1.0
+
+
+def test_depth_map_to_mesh_generate_uses_alpha_mask():
+    # Arrange
+    node = DepthMapToMesh()
+    data = np.random.rand(1, 10, 10, 4).astype(np.float32)
+    data[0, :5, :, 3] = 0.0
+
+    # Act
+    with patch("depth2mesh.nodes.depth2mesh_from_array") as mock_core_func:
+        node.generate(MockTensor(data), 10.0, 10.0, 5.0, 1.0)
+
+    # Assert
+    _, kwargs = mock_core_func.call_args
+    assert not kwargs["mask"][:5].any()
+    assert kwargs["mask"][5:].all()
 
 
 def test_simplify_mesh_performs_simplification(mock_mesh):
     # Arrange
     node = SimplifyMesh()
     # Set face count higher than target so it triggers simplification
+    mock_mesh.faces = np.zeros((1000, 3), dtype=np.int64)
+    target = 500
+
+    mock_fast_simplification = MagicMock()
+    simplified_faces = np.array([[0, 1, 2]])
+    mock_fast_simplification.simplify.return_value = (
+        mock_mesh.vertices,
+        simplified_faces,
+    )
+
+    # Act
+    with patch.dict(sys.modules, {"fast_simplification": mock_fast_simplification}):
+        result = node.simplify(mock_mesh, target)
+
+    # Assert
+    # fast-simplification is called directly rather than through trimesh
+    _, kwargs = mock_fast_simplification.simplify.call_args
+    assert kwargs == {"target_count": target}
+    mock_mesh.simplify_quadric_decimation.assert_not_called()
+    assert np.array_equal(result[0].faces, simplified_faces)
+
+
+def test_simplify_mesh_uses_meshoptimizer_fallback():
+    # Arrange
+    pytest.importorskip("meshoptimizer")
+    node = SimplifyMesh()
+    mesh = trimesh.creation.icosphere(subdivisions=3)
+    target = len(mesh.faces) // 4
+
+    # Act
+    with patch.dict(sys.modules, {"fast_simplification": None}):
+        result = node.simplify(mesh, target)
+
+    # Assert
+    simplified_mesh = result[0]
+    assert len(simplified_mesh.faces) < len(mesh.faces)
+    assert simplified_mesh.faces.max() < len(simplified_mesh.vertices)
+
+
+def test_simplify_mesh_falls_back_to_trimesh(mock_mesh):
+    # Arrange
+    node = SimplifyMesh()
     mock_mesh.faces = np.zeros((1000, 3))
     target = 500
 
     # Act
-    result = node.simplify(mock_mesh, target)
+    with patch.dict(sys.modules, {"fast_simplification": None, "meshoptimizer": None}):
+        result = node.simplify(mock_mesh, target)
 
     # Assert
-    # Logic: simplified_mesh = mesh.simplify_quadric_decimation...
     mock_mesh.simplify_quadric_decimation.assert_called_with(face_count=target)
     assert result[0] == mock_mesh.simplify_quadric_decimation.return_value
 
 
+def test_simplify_mesh_uses_quadric_decimation_for_extreme_reduction():
+    # Arrange
+    node = SimplifyMesh()
+    mesh = trimesh.creation.icosphere(subdivisions=4)
+    target = len(mesh.faces) // 20
+
+    # Act
+    result = node.simplify(mesh, target)
+
+    # Assert
+    # Output must stay closed for CNC use, so no vertex-clustering shortcut
+    simplified_mesh = result[0]
+    assert len(simplified_mesh.faces) == target
+    assert simplified_mesh.is_watertight
+
+
+def test_cluster_vertices_keeps_thin_relief_off_the_base():
+    # Arrange
+    x = np.linspace(0, 4 * np.pi, 120)
+    heights = 0.05 + 0.05 * np.sin(x)[None, :] * np.cos(x)[:, None] ** 2
+    mesh = depth2mesh_from_array(heights, 100, 100, 0.5)
+    top_floor = mesh.vertices[mesh.vertices[:, 2] > 0, 2].min()
+    target = len(mesh.faces) // 20
+
+    # Act
+    simplified_mesh = _cluster_vertices(mesh, target)
+
+    # Assert
+    z = simplified_mesh.vertices[:, 2]
+    assert 0 < len(simplified_mesh.faces) < len(mesh.faces) // 5
+    assert len(simplified_mesh.nondegenerate_faces()) == len(simplified_mesh.faces)
+    assert np.all((z == 0) | (z >= top_floor - 1e-9))
+
+
+def test_simplify_mesh_reuses_cached_result():
+    # Arrange
+    node = SimplifyMesh()
+    mesh = trimesh.creation.icosphere(subdivisions=3)
+    same_geometry = mesh.copy()
+    target = len(mesh.faces) // 2
+
+    # Act
+    first = node.simplify(mesh, target)[0]
+    with patch("depth2mesh.nodes._decimate") as mock_decimate:
+        second = node.simplify(same_geometry, target)[0]
+        node.simplify(mesh, target - 1)
+
+    # Assert
+    assert second is first
+    # A different target is a different cache entry
+    mock_decimate.assert_called_once_with(mesh, target - 1)
+
+
 def test_simplify_mesh_skips_if_already_small(mock_mesh):
     # Arrange
     node = SimplifyMesh()
@@ -122,6 +281,25 @@ def test_simplify_mesh_skips_if_already_small(mock_mesh):
     assert result[0] == mock_mesh
 
 
+@pytest.mark.parametrize(
+    "target, min_reduction, expected_calls",
+    [(990, 0.05, 0), (990, 0.0, 1), (900, 0.05, 1), (900, 0.2, 0)],
+)
+def test_simplify_mesh_min_reduction(mock_mesh, target, min_reduction, expected_calls):
+    # Arrange
+    node = SimplifyMesh()
+    mock_mesh.faces = np.zeros((1000, 3))
+
+    # Act
+    with patch("depth2mesh.nodes._decimate") as mock_decimate:
+        result = node.simplify(mock_mesh, target, min_reduction=min_reduction)
+
+    # Assert
+    assert mock_decimate.call_count == expected_calls
+    if not expected_calls:
+        assert result[0] is mock_mesh
+
+
 def test_save_mesh_stl(mock_mesh, tmp_path):
     # Arrange
     node = SaveMeshSTL()
@@ -153,9 +331,105 @@ def test_save_mesh_stl(mock_mesh, tmp_path):
             result = node.save(mock_mesh, filename_prefix)
 
             # Assert
-            mock_mesh.export.assert_called_with(target_file_2)
-            assert "ui" in result
-            assert "status" in result["ui"]
+            assert result["ui"]["status"] == [f"Saved to {target_file_2}"]
+
+    saved = trimesh.load(target_file_2)
+    assert np.allclose(saved.vertices, mock_mesh.vertices)
+    assert np.allclose(saved.face_normals, [[0.0, 0.0, 1.0]])
+
+
+def test_save_mesh_stl_continues_after_existing_files(mock_mesh, tmp_path):
+    # Arrange
+    node = SaveMeshSTL()
+    output_dir = str(tmp_path)
+    (tmp_path / "TEST_00001.stl").touch()
+    (tmp_path / "TEST_00007.stl").touch()
+    (tmp_path / "OTHER_00042.stl").touch()
+
+    mock_folder_paths = MagicMock()
+    mock_folder_paths.get_output_directory.return_value = output_dir
+
+    with patch.dict(sys.modules, {"folder_paths": mock_folder_paths}):
+        # Act
+        node.save(mock_mesh, "TEST_")
+        node.save(mock_mesh, "TEST_")
+
+    # Assert
+    # Counter continues after the highest existing file, then from the cache
+    assert (tmp_path / "TEST_00008.stl").is_file()
+    assert (tmp_path / "TEST_00009.stl").is_file()
+    assert not (tmp_path / "TEST_00002.stl").exists()
+
+
+def test_save_mesh_stl_uses_counter_file(mock_mesh, tmp_path):
+    # Arrange
+    pytest.importorskip("fcntl")
+    node = SaveMeshSTL()
+    (tmp_path / ".TEST_.ctr").write_text("42")
+    (tmp_path / "TEST_00042.stl").touch()
+
+    mock_folder_paths = MagicMock()
+    mock_folder_paths.get_output_directory.return_value = str(tmp_path)
+
+    # Act
+    with patch.dict(sys.modules, {"folder_paths": mock_folder_paths}):
+        node.save(mock_mesh, "TEST_")
+
+    # Assert
+    # The stale counter skips the existing file and is advanced past the new one
+    assert (tmp_path / "TEST_00043.stl").is_file()
+    assert (tmp_path / ".TEST_.ctr").read_text() == "44"
+
+
+def test_save_mesh_stl_without_file_locking(mock_mesh, tmp_path):
+    # Arrange
+    node = SaveMeshSTL()
+    (tmp_path / "TEST_00003.stl").touch()
+
+    mock_folder_paths = MagicMock()
+    mock_folder_paths.get_output_directory.return_value = str(tmp_path)
+
+    # Act
+    with patch.dict(sys.modules, {"folder_paths": mock_folder_paths, "fcntl": None}):
+        node.save(mock_mesh, "TEST_")
+
+    # Assert
+    assert (tmp_path / "TEST_00004.stl").is_file()
+    assert not (tmp_path / ".TEST_.ctr").exists()
+
+
+def test_write_binary_stl_normals_follow_winding(tmp_path):
+    # Arrange
+    mesh = trimesh.creation.box()
+    _ = mesh.face_normals  # Populate the cache before inverting
+    mesh.invert()
+    filepath = str(tmp_path / "inverted.stl")
+
+    # Act
+    _write_binary_stl(mesh, filepath)
+
+    # Assert
+    records = np.fromfile(filepath, dtype=BINARY_STL_DTYPE, offset=84)
+    tris = records["vertices"]
+    expected = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    assert len(records) == len(mesh.faces)
+    assert np.allclose(records["normal"], expected)
+
+
+def test_first_free_counter_lists_directory_once(tmp_path):
+    # Arrange
+    for counter in range(1, 51):
+        (tmp_path / f"TEST_{counter:05d}.stl").touch()
+
+    # Act
+    with patch("os.path.exists", wraps=os.path.exists) as mock_exists:
+        with patch("os.listdir", wraps=os.listdir) as mock_listdir:
+            counter = _first_free_counter(str(tmp_path), "TEST_", 1)
+
+    # Assert
+    assert counter == 51
+    assert mock_exists.call_count == 1
+    assert mock_listdir.call_count == 1
 
 
 def test_preview_mesh_stl_returns_image(mock_mesh):
@@ -176,3 +450,160 @@ def test_preview_mesh_stl_returns_image(mock_mesh):
         assert len(image_output.shape) == 4
         assert image_output.shape[0] == 1  # Batch size 1
         assert image_output.shape[3] == 3  # RGB channels
+
+
+def test_preview_mesh_stl_reuses_figure(mock_mesh):
+    # Arrange
+    node = PreviewMeshSTL()
+    node.preview(mock_mesh)
+    fig = PreviewMeshSTL._fig
+
+    # Act
+    result = node.preview(mock_mesh)
+
+    # Assert
+    assert PreviewMeshSTL._fig is fig
+    assert len(PreviewMeshSTL._ax.collections) == 1
+    assert result[0].shape[0] == 1
+
+
+@pytest.mark.parametrize("inverted", [False, True])
+def test_preview_mesh_stl_culls_back_faces(inverted):
+    # Arrange
+    from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+
+    drawn = []
+
+    class RecordingCollection(Poly3DCollection):
+        def __init__(self, verts, *args, **kwargs):
+            drawn.append(np.asarray(verts))
+            super().__init__(verts, *args, **kwargs)
+
+    node = PreviewMeshSTL()
+    # Closed box: half the faces point towards the camera, half away
+    mesh = trimesh.creation.box()
+    if inverted:
+        # Inward winding must not flip which sides are drawn
+        mesh.invert()
+
+    # Act
+    with patch("mpl_toolkits.mplot3d.art3d.Poly3DCollection", RecordingCollection):
+        with patch.dict(sys.modules, {"pyrender": None}):
+            node.preview(mesh)
+
+    # Assert
+    # The default isometric view sees exactly three sides (six triangles) of a box,
+    # namely the ones whose centers lie towards the camera
+    tris = drawn[0]
+    assert len(tris) == 6
+    assert np.all(tris.mean(axis=1) @ PREVIEW_VIEW_DIR > 0)
+
+
+def test_preview_mesh_stl_culls_open_simplified_mesh():
+    # Arrange
+    from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+
+    drawn = []
+
+    class RecordingCollection(Poly3DCollection):
+        def __init__(self, verts, *args, **kwargs):
+            drawn.append(np.asarray(verts))
+            super().__init__(verts, *args, **kwargs)
+
+    node = PreviewMeshSTL()
+    # Inward wound like the meshes from depth2mesh, and above the preview face limit
+    mesh = trimesh.creation.icosphere(subdivisions=6)
+    mesh.invert()
+
+    def open_decimate(mesh, target_face_count):
+        # Simplified previews need not be watertight; keep the winding, drop a face
+        return trimesh.Trimesh(mesh.vertices, mesh.faces[1:], process=False)
+
+    # Act
+    with patch("mpl_toolkits.mplot3d.art3d.Poly3DCollection", RecordingCollection):
+        with patch("depth2mesh.nodes._decimate", open_decimate):
+            with patch.dict(sys.modules, {"pyrender": None}):
+                node.preview(mesh)
+
+    # Assert
+    tris = drawn[0]
+    assert 0 < len(tris) < len(mesh.faces) // 2 + 1
+    # Faces on the silhouette may have their center just behind the equator
+    assert np.all(tris.mean(axis=1) @ PREVIEW_VIEW_DIR > -0.05)
+
+
+def test_preview_mesh_stl_uses_pyrender_when_available(mock_mesh):
+    # Arrange
+    node = PreviewMeshSTL()
+    mock_mesh.bounds = np.array([[0.0, 0.0, 0.0], [1.0, 1.0, 0.0]])
+
+    # Fake pyrender module returning a solid grey framebuffer
+    mock_pyrender = MagicMock()
+    color = np.full((64, 64, 3), 128, dtype=np.uint8)
+    mock_pyrender.OffscreenRenderer.return_value.render.return_value = (color, None)
+
+    # Act
+    with patch.dict(sys.modules, {"pyrender": mock_pyrender}):
+        with patch.object(PreviewMeshSTL, "_renderer", None):
+            with patch.object(PreviewMeshSTL, "_renderer_unavailable", False):
+                result = node.preview(mock_mesh)
+
+    # Assert
+    mock_pyrender.MetallicRoughnessMaterial.assert_called_once_with(
+        baseColorFactor=[0.8, 0.8, 0.8, 1.0],
+        metallicFactor=0.0,
+        roughnessFactor=0.8,
+        doubleSided=True,
+    )
+    mock_pyrender.Mesh.from_trimesh.assert_called_once_with(
+        mock_mesh,
+        material=mock_pyrender.MetallicRoughnessMaterial.return_value,
+        smooth=False,
+    )
+    mock_mesh.simplify_quadric_decimation.assert_not_called()
+    image_output = result[0]
+    assert image_output.shape == (1, 64, 64, 3)
+    assert np.allclose(np.asarray(image_output), 128 / 255.0)
+
+
+def test_preview_mesh_stl_renders_outward_wound_copy_with_pyrender():
+    # Arrange
+    node = PreviewMeshSTL()
+    # Inward wound, like the meshes from depth2mesh
+    mesh = trimesh.creation.box()
+    mesh.invert()
+
+    mock_pyrender = MagicMock()
+    color = np.full((64, 64, 3), 128, dtype=np.uint8)
+    mock_pyrender.OffscreenRenderer.return_value.render.return_value = (color, None)
+
+    # Act
+    with patch.dict(sys.modules, {"pyrender": mock_pyrender}):
+        with patch.object(PreviewMeshSTL, "_renderer", None):
+            with patch.object(PreviewMeshSTL, "_renderer_unavailable", False):
+                node.preview(mesh)
+
+    # Assert
+    rendered = mock_pyrender.Mesh.from_trimesh.call_args[0][0]
+    assert rendered is not mesh
+    assert rendered.volume > 0
+    assert mesh.volume < 0
+
+
+def test_preview_mesh_stl_remembers_pyrender_failure(mock_mesh):
+    # Arrange
+    node = PreviewMeshSTL()
+    mock_pyrender = MagicMock()
+    mock_pyrender.OffscreenRenderer.side_effect = RuntimeError("no EGL")
+
+    # Act
+    with patch.dict(sys.modules, {"pyrender": mock_pyrender}):
+        with patch.object(PreviewMeshSTL, "_renderer", None):
+            with patch.object(PreviewMeshSTL, "_renderer_unavailable", False):
+                node.preview(mock_mesh)
+                result = node.preview(mock_mesh)
+
+    # Assert
+    # The failing context is only attempted once; both calls fall back to Matplotlib
+    mock_pyrender.OffscreenRenderer.assert_called_once()
+    assert result[0].shape[0] == 1